@@ -0,0 +1 @@
+from .scan import Finding, ScanStats, parallel_executor, scan_files, scan_sources
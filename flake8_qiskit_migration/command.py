@@ -2,8 +2,28 @@ import sys
 from flake8.main.cli import main as flake8_main
 
 def cli():
+    args = sys.argv[1:]
+    if "--watch" in args:
+        # Watch mode doesn't go through flake8, so it only needs to load the
+        # rule tables once for the whole session.
+        from .watch import main as watch_main
+        args.remove("--watch")
+        watch_main(args)
+        return
+    if "--history" in args:
+        from .history import main as history_main
+        args.remove("--history")
+        history_main(args)
+        return
+    if "--parallel" in args:
+        # Scan on our own workers rather than flake8's, so on free-threaded
+        # Python they can be threads sharing one copy of the rule tables.
+        from .scan import main as scan_main
+        args.remove("--parallel")
+        scan_main(args)
+        return
     # I don't love this as `flake8_main` technically isn't a public API, but we
     # can't use `subprocess.run` as `pipx run ...` doesn't make `flake8`
     # available on PATH. I think this workaround is probably OK as
     # `flake8_main` hasn't changed in ~3yrs.
-    flake8_main(["--select", "QKT"] + sys.argv[1:])
+    flake8_main(["--select", "QKT"] + args)
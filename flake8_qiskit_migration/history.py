@@ -0,0 +1,180 @@
+"""
+History mode for the command line tool.
+
+Counts problems per rule code at every commit in a range of git history, to
+chart migration progress over time. Objects are read through a single
+`git cat-file --batch` process, and results are cached by object ID, so each
+distinct file (and directory) is only analysed once across all commits.
+"""
+from __future__ import annotations
+
+import argparse
+from collections import Counter
+import csv
+import subprocess
+import sys
+from typing import Iterator, TextIO
+
+from .plugin import Visitor, select_codes
+from .scan import is_excluded_dir, scan_source
+
+# Tree entry modes, as written in git tree objects
+TREE_MODE = b"40000"
+BLOB_MODES = (b"100644", b"100755")
+
+
+class ObjectReader:
+    """Reads objects from a repository through one long-lived `git cat-file --batch`"""
+
+    def __init__(self, repo: str = "."):
+        self._proc = subprocess.Popen(
+            ["git", "-C", repo, "cat-file", "--batch"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    def read(self, oid: str) -> tuple[str, bytes]:
+        """Returns the type and contents of the object `oid`"""
+        self._proc.stdin.write(oid.encode() + b"\n")
+        self._proc.stdin.flush()
+        header = self._proc.stdout.readline().split()
+        if len(header) != 3:
+            raise KeyError(oid)
+        _, obj_type, size = header
+        data = self._proc.stdout.read(int(size))
+        self._proc.stdout.read(1)  # trailing newline
+        return obj_type.decode(), data
+
+    def close(self) -> None:
+        self._proc.stdin.close()
+        self._proc.wait()
+
+    def __enter__(self) -> ObjectReader:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class HistoryScanner:
+    """
+    Counts problems per rule code in git trees, caching counts for every blob
+    and tree it has seen.
+    """
+
+    def __init__(self, reader: ObjectReader, rules=("QKT",)):
+        self.reader = reader
+        self.codes = select_codes(rules)
+        self._visitor = Visitor(self.codes)
+        self._blob_counts: dict[str, Counter] = {}
+        # tree ID -> (problem counts, number of Python files)
+        self._tree_counts: dict[str, tuple[Counter, int]] = {}
+        self.files_seen = 0  # Python files in every commit scanned, including repeats
+
+    @property
+    def blobs_scanned(self) -> int:
+        return len(self._blob_counts)
+
+    def commit_counts(self, tree: str) -> Counter:
+        """Problem counts for a commit with root tree `tree`"""
+        counts, num_files = self._tree(tree)
+        self.files_seen += num_files
+        return counts
+
+    def blob_counts(self, oid: str, name: str) -> Counter:
+        if oid not in self._blob_counts:
+            _, source = self.reader.read(oid)
+            findings = scan_source(name, source, self._visitor)
+            self._blob_counts[oid] = Counter(finding.code for finding in findings)
+        return self._blob_counts[oid]
+
+    def _tree(self, oid: str) -> tuple[Counter, int]:
+        if oid in self._tree_counts:
+            return self._tree_counts[oid]
+        _, data = self.reader.read(oid)
+        counts = Counter()
+        num_files = 0
+        for mode, name, entry_oid in _tree_entries(data, len(oid) // 2):
+            if mode == TREE_MODE:
+                if not is_excluded_dir(name):
+                    subtree_counts, subtree_files = self._tree(entry_oid)
+                    counts.update(subtree_counts)
+                    num_files += subtree_files
+            elif mode in BLOB_MODES and name.endswith(".py"):
+                counts.update(self.blob_counts(entry_oid, name))
+                num_files += 1
+        self._tree_counts[oid] = (counts, num_files)
+        return counts, num_files
+
+
+def _tree_entries(data: bytes, oid_size: int) -> Iterator[tuple[bytes, str, str]]:
+    """Parse a raw tree object into (mode, name, oid) entries"""
+    offset = 0
+    while offset < len(data):
+        space = data.index(b" ", offset)
+        nul = data.index(b"\0", space)
+        oid = data[nul + 1:nul + 1 + oid_size].hex()
+        yield data[offset:space], data[space + 1:nul].decode(errors="surrogateescape"), oid
+        offset = nul + 1 + oid_size
+
+
+def list_commits(revisions: list[str], repo: str = ".", first_parent: bool = False) -> list[tuple[str, str, str]]:
+    """Returns (commit, tree, date) for each commit in `revisions`, oldest first"""
+    cmd = ["git", "-C", repo, "log", "--reverse", "--format=%H %T %cI"]
+    if first_parent:
+        cmd.append("--first-parent")
+    output = subprocess.run(cmd + revisions + ["--"], check=True, capture_output=True, text=True).stdout
+    return [tuple(line.split()) for line in output.splitlines()]
+
+
+def history(
+    revisions: list[str],
+    repo: str = ".",
+    rules=("QKT",),
+    first_parent: bool = False,
+    out: TextIO = sys.stdout,
+) -> HistoryScanner:
+    """Write a CSV of problem counts per rule code for each commit"""
+    commits = list_commits(revisions, repo, first_parent)
+    with ObjectReader(repo) as reader:
+        scanner = HistoryScanner(reader, rules)
+        codes = list(scanner.codes)
+        writer = csv.writer(out)
+        writer.writerow(["commit", "date"] + codes)
+        for commit, tree, date in commits:
+            counts = scanner.commit_counts(tree)
+            writer.writerow([commit, date] + [counts[code] for code in codes])
+    return scanner
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="flake8-qiskit-migration --history",
+        description="Write a CSV of problems per rule code at each commit in a range of git history.",
+    )
+    parser.add_argument(
+        "revisions",
+        nargs="*",
+        default=["HEAD"],
+        help="revisions to scan, as accepted by `git log` (default: HEAD)",
+    )
+    parser.add_argument("--repo", default=".", help="path to the git repository (default: .)")
+    parser.add_argument(
+        "--select",
+        default="QKT",
+        help="comma-separated rule codes to count, like flake8's --select (default: QKT)",
+    )
+    parser.add_argument(
+        "--first-parent",
+        action="store_true",
+        help="only follow the first parent of merge commits",
+    )
+    args = parser.parse_args(argv)
+    try:
+        scanner = history(args.revisions, args.repo, args.select.split(","), args.first_parent)
+    except subprocess.CalledProcessError as e:
+        sys.exit(e.stderr.strip())
+    print(
+        f"Analysed {scanner.blobs_scanned} unique files for {scanner.files_seen} files across all commits",
+        file=sys.stderr,
+    )
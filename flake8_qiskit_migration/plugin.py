@@ -3,17 +3,34 @@ from __future__ import annotations
 import ast
 from dataclasses import dataclass
 import importlib.metadata
+import importlib.util
+import re
+from types import MappingProxyType
+from typing import AbstractSet, Mapping
 
 from .deprecated_paths import DEPRECATED_PATHS, EXCEPTIONS
 from .deprecated_paths_v2 import DEPRECATED_PATHS_V2, EXCEPTIONS_V2
 
-RULE_SETS = [
-    ("QKT100", DEPRECATED_PATHS, EXCEPTIONS),
-    ("QKT200", DEPRECATED_PATHS_V2, EXCEPTIONS_V2),
-]
+# Read-only views of the rule tables, so they can be shared between threads
+# without locking. Visitors hold all the mutable state.
+RULE_SETS = (
+    ("QKT100", MappingProxyType(DEPRECATED_PATHS), frozenset(EXCEPTIONS)),
+    ("QKT200", MappingProxyType(DEPRECATED_PATHS_V2), frozenset(EXCEPTIONS_V2)),
+)
 
+# Modules imported by name (e.g. `importlib.import_module("qiskit.opflow")`),
+# and strings in dict values or list/tuple/set elements that look like Qiskit
+# import paths (e.g. plugin config), are checked against every rule set but
+# reported under their own code. Other strings, such as logger names or
+# dict keys, are left alone.
+DYNAMIC_IMPORT_CODE = "QKT300"
+DYNAMIC_IMPORT_FUNCTIONS = frozenset({"importlib.import_module", "import_module", "__import__", "builtins.__import__"})
+QISKIT_PATH_PATTERN = re.compile(r"qiskit(\.[A-Za-z_][A-Za-z0-9_]*)+")
 
-def _check_path(path: str, original_import_path: str, prefix: str, paths_dict: dict, exceptions: list) -> str | None:
+CODES = tuple(code for code, _, _ in RULE_SETS) + (DYNAMIC_IMPORT_CODE,)
+
+
+def _check_path(path: str, original_import_path: str, prefix: str, paths_dict: Mapping[str, str], exceptions: AbstractSet[str]) -> str | None:
     """
     Recursively check if a path matches a deprecated path in the given dict.
 
@@ -29,12 +46,31 @@ def _check_path(path: str, original_import_path: str, prefix: str, paths_dict: d
     return f"{prefix}: " + paths_dict[path].format(original_import_path)
 
 
-def deprecation_messages(path: str, original_import_path: str | None = None) -> list[str]:
+def select_codes(codes) -> tuple[str, ...]:
+    """
+    Get the rule codes that start with any of `codes`, in the same way as
+    flake8's `--select` (e.g. "QKT" selects everything). `codes` may also be
+    a single code.
+    """
+    if isinstance(codes, str):
+        codes = (codes,)
+    return tuple(code for code in CODES if code.startswith(tuple(codes)))
+
+
+def deprecation_messages(
+    path: str,
+    original_import_path: str | None = None,
+    rule_sets: tuple = RULE_SETS,
+    code: str | None = None,
+) -> list[str]:
     """
     Build deprecation messages from all rule sets.
 
     Args:
         path: Python import path of the form `qiskit.extensions.thing`
+        rule_sets: Rule sets to check against (defaults to all of them)
+        code: Report every message under this code, rather than the code of
+            the rule set that matched
 
     Returns:
         List of deprecation message strings (may be empty)
@@ -43,8 +79,8 @@ def deprecation_messages(path: str, original_import_path: str | None = None) ->
     if "." not in path:
         return []
     messages = []
-    for prefix, paths_dict, exceptions in RULE_SETS:
-        msg = _check_path(path, original_import_path, prefix, paths_dict, exceptions)
+    for prefix, paths_dict, exceptions in rule_sets:
+        msg = _check_path(path, original_import_path, code or prefix, paths_dict, exceptions)
         if msg is not None:
             messages.append(msg)
     return messages
@@ -56,7 +92,13 @@ class Visitor(ast.NodeVisitor):
     aliases and scopes, but not assignments.
     """
 
-    def __init__(self):
+    def __init__(self, codes: tuple[str, ...] = CODES):
+        self.rule_sets = tuple(rule_set for rule_set in RULE_SETS if rule_set[0] in codes)
+        self.check_dynamic_imports = DYNAMIC_IMPORT_CODE in codes
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget problems and aliases so the visitor can be reused on another tree"""
         self.problems: list[Problem] = []
         self.mappings: list[dict[str, str]] = [{}]  # track aliases for each scope
 
@@ -83,11 +125,37 @@ class Visitor(ast.NodeVisitor):
         Adds path to problems if deprecated, ignores otherwise
         Returns True if any problem was reported
         """
-        msgs = deprecation_messages(path)
+        msgs = deprecation_messages(path, rule_sets=self.rule_sets)
         for msg in msgs:
             self.problems.append(Problem(node, msg))
         return len(msgs) > 0
 
+    def report_dynamic_import(self, path: str, node) -> None:
+        """
+        Adds path to problems under the dynamic import code if deprecated.
+        Only the first matching rule set's message is used, so each location
+        is reported once.
+        """
+        if not self.check_dynamic_imports:
+            return
+        msgs = deprecation_messages(path, code=DYNAMIC_IMPORT_CODE)
+        if msgs:
+            self.problems.append(Problem(node, msgs[0]))
+
+    def report_qiskit_path_strings(self, nodes) -> None:
+        for node in nodes:
+            if _is_str(node) and QISKIT_PATH_PATTERN.fullmatch(node.value):
+                self.report_dynamic_import(node.value, node)
+
+    def get_path(self, node) -> str | None:
+        """Full path of an attribute, e.g. `qk.circuit.Gate` -> `qiskit.circuit.Gate`"""
+        if isinstance(node, ast.Name):
+            return node.id
+        if isinstance(node, ast.Attribute):
+            parents = self.resolve_aliases(self.get_path(node.value))
+            return f"{parents}.{node.attr}"
+        return None
+
     def visit_Import(self, node: ast.Import) -> None:
         for alias in node.names:
             self.add_alias(alias)
@@ -102,18 +170,46 @@ class Visitor(ast.NodeVisitor):
         self.generic_visit(node)
 
     def visit_Attribute(self, node: ast.Attribute) -> None:
-        def _get_parents(node):
-            if isinstance(node, ast.Name):
-                return node.id
-            if isinstance(node, ast.Attribute):
-                parents = _get_parents(node.value)
-                parents = self.resolve_aliases(parents)
-                return f"{parents}.{node.attr}"
-
-        path = _get_parents(node)
+        path = self.get_path(node)
         if not self.report_if_deprecated(path, node):
             self.generic_visit(node)
 
+    def visit_Call(self, node: ast.Call) -> None:
+        function = self.resolve_aliases(self.get_path(node.func))
+        if function not in DYNAMIC_IMPORT_FUNCTIONS or not node.args or not _is_str(node.args[0]):
+            self.generic_visit(node)
+            return
+        path = node.args[0].value
+        if function.endswith("__import__"):
+            # `__import__("qiskit", fromlist=["Aer"])` imports `qiskit.Aer`
+            fromlist = _call_argument(node, 3, "fromlist")
+            names = fromlist.elts if isinstance(fromlist, (ast.List, ast.Tuple)) else []
+            paths = [f"{path}.{name.value}" for name in names if _is_str(name)] or [path]
+        else:
+            package = _call_argument(node, 1, "package")
+            try:
+                paths = [importlib.util.resolve_name(path, package.value if _is_str(package) else None)]
+            except (ImportError, ValueError):
+                paths = []
+        for path in paths:
+            self.report_dynamic_import(path, node)
+        # Visit everything but the module name, so it isn't reported again as
+        # a string constant
+        self.visit(node.func)
+        for child in node.args[1:] + node.keywords:
+            self.visit(child)
+
+    def visit_Dict(self, node: ast.Dict) -> None:
+        self.report_qiskit_path_strings(node.values)
+        self.generic_visit(node)
+
+    def visit_List(self, node: ast.List) -> None:
+        self.report_qiskit_path_strings(node.elts)
+        self.generic_visit(node)
+
+    visit_Tuple = visit_List
+    visit_Set = visit_List
+
     # Push / pop scopes for aliases
     def visit_FunctionDef(self, node: ast.FunctionDef):
         self.enter_scope()
@@ -131,6 +227,20 @@ class Visitor(ast.NodeVisitor):
         self.exit_scope()
 
 
+def _is_str(node) -> bool:
+    return isinstance(node, ast.Constant) and isinstance(node.value, str)
+
+
+def _call_argument(node: ast.Call, position: int, keyword: str):
+    """Get an argument of a call by position or keyword, or None if not given"""
+    if len(node.args) > position:
+        return node.args[position]
+    for kw in node.keywords:
+        if kw.arg == keyword:
+            return kw.value
+    return None
+
+
 class Plugin:
     name = "flake8_qiskit_migration"
     version = importlib.metadata.version("flake8_qiskit_migration")
@@ -0,0 +1,402 @@
+"""
+Scan Python sources directly, without going through flake8.
+
+This is used by the long-running modes of the command line tool (such as
+`--watch`), where paying flake8's startup cost on every run is wasteful, by
+`--parallel`, which scans on threads on free-threaded Python builds, and by tools
+that want to check sources that aren't on the filesystem.
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+from collections import defaultdict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import contextlib
+from dataclasses import dataclass
+import hashlib
+import itertools
+import os
+import re
+import sys
+import threading
+from typing import Iterable, Iterator, NamedTuple
+
+from .plugin import Visitor, select_codes
+
+# Same directories flake8 skips by default
+EXCLUDED_DIRS = frozenset({".svn", "CVS", ".bzr", ".hg", ".git", "__pycache__", ".tox", ".nox", ".eggs"})
+
+# Same `# noqa` comments flake8 understands. These match bytes, so sources
+# don't need decoding; the comments are ASCII in any encoding Python accepts.
+NOQA_INLINE = re.compile(rb"# noqa(?::[\s]?(?P<codes>([A-Z]+[0-9]+(?:[,\s]+)?)+))?", re.IGNORECASE)
+NOQA_FILE = re.compile(rb"\s*# flake8[:=]\s*noqa", re.IGNORECASE)
+
+
+class Finding(NamedTuple):
+    name: str
+    line: int
+    col: int
+    msg: str
+
+    @property
+    def code(self) -> str:
+        return self.msg.split(":", 1)[0]
+
+    def format(self) -> str:
+        # Match flake8's default output format (columns are 1-indexed)
+        return f"{self.name}:{self.line}:{self.col + 1}: {self.msg}"
+
+
+def is_excluded_dir(name: str) -> bool:
+    return name in EXCLUDED_DIRS or name.endswith(".egg")
+
+
+def iter_python_files(paths: Iterable[str]) -> Iterator[str]:
+    """
+    Yield every Python file in `paths`, walking into directories.
+
+    Files given explicitly are always yielded, even without a `.py` suffix.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(d for d in dirnames if not is_excluded_dir(d))
+            for filename in sorted(filenames):
+                if filename.endswith(".py"):
+                    yield os.path.join(dirpath, filename)
+
+
+def scan_source(name: str, source: str | bytes, visitor: Visitor | None = None) -> list[Finding]:
+    """
+    Find deprecated imports in a single source.
+
+    Bytes are passed straight to the parser, which honours PEP 263 encoding
+    declarations, so there's no need to decode them first. Sources that fail
+    to parse produce no findings; flake8 reports those itself as E999.
+    """
+    try:
+        tree = ast.parse(source, filename=name)
+    except (SyntaxError, ValueError):
+        return []
+    if visitor is None:
+        visitor = Visitor()
+    else:
+        visitor.reset()
+    visitor.visit(tree)
+    findings = [
+        Finding(name, problem.node.lineno, problem.node.col_offset, problem.msg)
+        for problem in visitor.problems
+    ]
+    return _without_noqa(findings, source)
+
+
+def _without_noqa(findings: list[Finding], source: str | bytes) -> list[Finding]:
+    """Drop findings suppressed by `# noqa` comments, as flake8 would"""
+    if isinstance(source, str):
+        source = source.encode()
+    if not findings or b"noqa" not in source.lower():
+        return findings
+    lines = source.splitlines()
+    if any(NOQA_FILE.match(line) for line in lines):
+        return []
+    kept = []
+    for finding in findings:
+        match = NOQA_INLINE.search(lines[finding.line - 1]) if finding.line <= len(lines) else None
+        if match is None:
+            kept.append(finding)
+            continue
+        codes = match.group("codes")
+        if codes is None:
+            continue  # blanket `# noqa`
+        codes = tuple(code.decode() for code in re.split(rb"[,\s]+", codes) if code)
+        if not finding.code.startswith(codes):
+            kept.append(finding)
+    return kept
+
+
+def scan_file(path: str, visitor: Visitor | None = None) -> list[Finding]:
+    """Read and scan a single file. Unreadable files produce no findings."""
+    try:
+        with open(path, "rb") as f:
+            source = f.read()
+    except OSError:
+        return []
+    return scan_source(path, source, visitor)
+
+
+def gil_enabled() -> bool:
+    # `sys._is_gil_enabled` was added in 3.13; older versions always have a GIL
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is None or is_gil_enabled()
+
+
+def parallel_executor(jobs: int | None = None) -> Executor:
+    """
+    Make an executor for scanning on `jobs` workers (default: one per CPU).
+
+    On free-threaded builds this is a thread pool, where every thread shares
+    the same rule tables. With the GIL, threads can't scan in parallel, so
+    this falls back to a process pool.
+    """
+    if gil_enabled():
+        return ProcessPoolExecutor(jobs)
+    return ThreadPoolExecutor(jobs or os.cpu_count())
+
+
+# Each worker thread (or process) keeps its own visitors; nothing else that
+# scanning touches is mutable.
+_worker_state = threading.local()
+
+
+def _worker_visitor(codes: tuple[str, ...]) -> Visitor:
+    """Get this thread's visitor for `codes`, so each worker only builds one"""
+    visitors = getattr(_worker_state, "visitors", None)
+    if visitors is None:
+        visitors = _worker_state.visitors = {}
+    if codes not in visitors:
+        visitors[codes] = Visitor(codes)
+    return visitors[codes]
+
+
+def _scan_batch(batch: list[tuple[str, str | bytes]], codes: tuple[str, ...]) -> list[Finding]:
+    visitor = _worker_visitor(codes)
+    findings = []
+    for name, source in batch:
+        findings.extend(scan_source(name, source, visitor))
+    return findings
+
+
+def _hash_file_batch(batch: list[str], codes: tuple[str, ...]) -> list[tuple[str, bytes | None, int]]:
+    """(path, digest, size) for each file; the digest is None if it can't be read"""
+    results = []
+    for path in batch:
+        source = _read(path)
+        if source is None:
+            results.append((path, None, 0))
+        else:
+            results.append((path, _digest(source), len(source)))
+    return results
+
+
+def _scan_file_batch(batch: list[str], codes: tuple[str, ...]) -> list[tuple[str, list[Finding]]]:
+    visitor = _worker_visitor(codes)
+    return [(path, scan_file(path, visitor)) for path in batch]
+
+
+def _map_batches(executor: Executor, fn, items: Iterable, codes: tuple[str, ...], batch_size: int, max_pending: int) -> Iterator:
+    """
+    Run `fn(batch, codes)` on the executor for batches of `items`, yielding
+    the results in order with at most `max_pending` batches in flight.
+    """
+    items = iter(items)
+    pending: deque = deque()
+    try:
+        while True:
+            while len(pending) < max_pending:
+                batch = list(itertools.islice(items, batch_size))
+                if not batch:
+                    break
+                pending.append(executor.submit(fn, batch, codes))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+    finally:
+        # Don't leave work queued if the caller stops iterating early
+        for future in pending:
+            future.cancel()
+
+
+def scan_sources(
+    sources: Iterable[tuple[str, str | bytes]],
+    rules: str | Iterable[str] = ("QKT",),
+    executor: Executor | None = None,
+    batch_size: int = 64,
+    max_pending: int = 32,
+) -> Iterator[Finding]:
+    """
+    Find deprecated imports in many sources, without flake8 or the filesystem.
+
+    Findings are yielded lazily, in the same order as `sources`, so this can be
+    fed from a generator over millions of sources.
+
+    Args:
+        sources: (name, source) pairs; `name` is only used in the findings.
+        rules: Rule codes to check, matched by prefix like flake8's
+            `--select`, or a single code. Defaults to all rules.
+        executor: Optional `concurrent.futures` executor to scan on, such as
+            one from `parallel_executor`. Sources are sent in batches of
+            `batch_size`, with at most `max_pending` batches in flight at once.
+
+    Yields:
+        Finding: (name, line, col, msg) for each problem
+    """
+    codes = select_codes(rules)
+    if executor is None:
+        visitor = Visitor(codes)
+        for name, source in sources:
+            yield from scan_source(name, source, visitor)
+        return
+    yield from _map_batches(executor, _scan_batch, sources, codes, batch_size, max_pending)
+
+
+@dataclass
+class ScanStats:
+    """How much work `scan_files` saved by skipping files with duplicate contents"""
+    files: int = 0
+    unique_files: int = 0
+    total_bytes: int = 0
+    unique_bytes: int = 0
+
+    @property
+    def duplicate_files(self) -> int:
+        return self.files - self.unique_files
+
+    def summary(self) -> str:
+        return (
+            f"Scanned {self.unique_files} unique files for {self.files} files; "
+            f"skipped {self.duplicate_files} duplicates "
+            f"({self.total_bytes - self.unique_bytes} of {self.total_bytes} bytes)"
+        )
+
+
+def _read(path: str) -> bytes | None:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _digest(source: bytes) -> bytes:
+    return hashlib.blake2b(source, digest_size=16).digest()
+
+
+def scan_files(
+    paths: Iterable[str],
+    rules: str | Iterable[str] = ("QKT",),
+    executor: Executor | None = None,
+    batch_size: int = 16,
+    max_pending: int = 64,
+    stats: ScanStats | None = None,
+) -> Iterator[Finding]:
+    """
+    Like `scan_sources`, but for files on disk.
+
+    Each distinct file content is only analysed once; files with the same
+    contents as an earlier file reuse its findings. If `stats` is given, it's
+    updated with how many files were skipped. Findings are yielded lazily in
+    the same order as `paths`. Unreadable files produce no findings.
+
+    With an executor, workers both hash and scan the files, so files are read
+    in parallel and their contents are never sent between processes.
+    """
+    codes = select_codes(rules)
+    if stats is None:
+        stats = ScanStats()
+    findings_by_digest: dict[bytes, list[Finding]] = {}
+
+    def replay(path: str, digest: bytes) -> list[Finding]:
+        return [finding._replace(name=path) for finding in findings_by_digest[digest]]
+
+    if executor is None:
+        visitor = Visitor(codes)
+        for path in paths:
+            source = _read(path)
+            if source is None:
+                continue
+            digest = _digest(source)
+            stats.files += 1
+            stats.total_bytes += len(source)
+            if digest in findings_by_digest:
+                yield from replay(path, digest)
+                continue
+            stats.unique_files += 1
+            stats.unique_bytes += len(source)
+            findings_by_digest[digest] = scan_source(path, source, visitor)
+            yield from findings_by_digest[digest]
+        return
+
+    # Files waiting to be reported, in order, with their content digests. The
+    # first file with each digest is scanned; later ones are replayed.
+    waiting: deque = deque()
+    # Digests of the files sent to be scanned, in the order results will arrive
+    scanning: deque = deque()
+    seen: set[bytes] = set()
+    hashed = _map_batches(executor, _hash_file_batch, paths, codes, batch_size, max_pending)
+
+    def unique_paths() -> Iterator[str]:
+        for path, digest, size in hashed:
+            if digest is None:
+                continue
+            stats.files += 1
+            stats.total_bytes += size
+            waiting.append((path, digest))
+            if digest not in seen:
+                seen.add(digest)
+                stats.unique_files += 1
+                stats.unique_bytes += size
+                scanning.append(digest)
+                yield path
+
+    def ready() -> Iterator[Finding]:
+        while waiting and waiting[0][1] in findings_by_digest:
+            path, digest = waiting.popleft()
+            yield from replay(path, digest)
+
+    scanned = _map_batches(executor, _scan_file_batch, unique_paths(), codes, batch_size, max_pending)
+    try:
+        for _, findings in scanned:
+            findings_by_digest[scanning.popleft()] = findings
+            yield from ready()
+    finally:
+        scanned.close()
+        hashed.close()
+
+
+def jobs_argument(value: str) -> int | None:
+    """Parse a number of workers from the command line; "auto" means one per CPU"""
+    if value == "auto":
+        return None
+    try:
+        jobs = int(value)
+    except ValueError:
+        jobs = 0
+    if jobs < 1:
+        raise argparse.ArgumentTypeError(f'expected a positive number or "auto", got {value!r}')
+    return jobs
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="flake8-qiskit-migration --parallel",
+        description="Report deprecated Qiskit imports on parallel workers, without going "
+        "through flake8. Workers are threads on free-threaded Python, processes otherwise.",
+    )
+    parser.add_argument("paths", nargs="*", default=["."])
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=jobs_argument,
+        default=None,
+        help='number of workers, or "auto" for one per CPU (default)',
+    )
+    parser.add_argument(
+        "--select",
+        default="QKT",
+        help="comma-separated rule codes to report, like flake8's --select (default: QKT)",
+    )
+    args = parser.parse_args(argv)
+    found = False
+    stats = ScanStats()
+    executor = contextlib.nullcontext() if args.jobs == 1 else parallel_executor(args.jobs)
+    with executor as executor:
+        paths = iter_python_files(args.paths)
+        for finding in scan_files(paths, args.select.split(","), executor, stats=stats):
+            print(finding.format())
+            found = True
+    print(stats.summary(), file=sys.stderr)
+    if found:
+        sys.exit(1)
@@ -0,0 +1,304 @@
+"""
+Watch mode for the command line tool.
+
+Keeps the rule tables and the findings for every file in memory, and only
+rescans files as they change. Changes are picked up through inotify on Linux,
+falling back to polling file modification times elsewhere.
+"""
+from __future__ import annotations
+
+import argparse
+from collections import defaultdict
+from concurrent.futures import Executor
+import contextlib
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from typing import Iterable, TextIO
+
+from .scan import Finding, ScanStats, is_excluded_dir, iter_python_files, jobs_argument, parallel_executor, scan_files
+
+# Constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+# Saving a file usually produces a burst of events; collect them into one rescan
+DEBOUNCE_SECONDS = 0.01
+
+
+class WatchSession:
+    """
+    Per-file findings, keyed by path, along with the (mtime, size) they were
+    computed from.
+
+    If an executor is given, walks of the whole tree are scanned on it. Single
+    files are always scanned in this process, which is quicker.
+    """
+
+    def __init__(self, paths: list[str], executor: Executor | None = None):
+        self.paths = paths
+        self.executor = executor
+        self._results: dict[str, tuple[tuple[int, int], list[Finding]]] = {}
+
+    def update(
+        self,
+        candidates: Iterable[str] | None = None,
+        stats: ScanStats | None = None,
+    ) -> list[tuple[str, list[Finding]]]:
+        """
+        Rescan `candidates`, which the watcher reported as changed. If
+        `candidates` is None, walk the whole tree and rescan files whose
+        (mtime, size) changed. `stats` is passed on to `scan_files`.
+
+        Returns (path, findings) for each file whose findings changed.
+        """
+        executor = None
+        walk = candidates is None
+        if walk:
+            candidates = set(iter_python_files(self.paths)) | set(self._results)
+            executor = self.executor
+        changed = []
+        to_scan = {}
+        for path in sorted(candidates):
+            try:
+                st = os.stat(path)
+                key = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                key = None
+            old = self._results.get(path)
+            if key is None:
+                if old is not None:
+                    del self._results[path]
+                    if old[1]:
+                        changed.append((path, []))
+                continue
+            # mtimes are too coarse to catch quick rewrites of the same size, so
+            # only trust them when there's no watcher telling us what changed
+            if not walk or old is None or old[0] != key:
+                to_scan[path] = key
+
+        findings_by_path = defaultdict(list)
+        for finding in scan_files(to_scan, executor=executor, stats=stats):
+            findings_by_path[finding.name].append(finding)
+        for path, key in to_scan.items():
+            old = self._results.get(path)
+            findings = findings_by_path[path]
+            self._results[path] = (key, findings)
+            if findings != (old[1] if old is not None else []):
+                changed.append((path, findings))
+        return sorted(changed)
+
+
+class PollingWatcher:
+    """Asks the session to re-walk the whole tree every `interval` seconds."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+
+    def wait(self) -> set[str] | None:
+        time.sleep(self.interval)
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """
+    Watches every directory under `paths` through inotify(7).
+
+    Raises OSError (or AttributeError where libc has no inotify) if inotify
+    can't be set up, for example when the watch limit is too low.
+    """
+
+    def __init__(self, paths: list[str]):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # watch descriptor -> (directory, {basename: path} or None for all .py files)
+        self._dirs: dict[int, tuple[str, dict[str, str] | None]] = {}
+        try:
+            for path in paths:
+                if os.path.isdir(path):
+                    self._watch_tree(path)
+                else:
+                    self._watch(os.path.dirname(path) or ".", {os.path.basename(path): path})
+        except OSError:
+            self.close()
+            raise
+
+    def _watch(self, directory: str, names: dict[str, str] | None = None) -> None:
+        wd = self._add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Could not watch {directory}")
+        if wd in self._dirs:
+            _, existing = self._dirs[wd]
+            names = None if existing is None or names is None else {**existing, **names}
+        self._dirs[wd] = (directory, names)
+
+    def _watch_tree(self, root: str) -> list[str]:
+        """Watch `root` and every directory below it; returns the .py files found"""
+        files = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not is_excluded_dir(d)]
+            self._watch(dirpath)
+            files.extend(os.path.join(dirpath, f) for f in filenames if f.endswith(".py"))
+        return files
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def __enter__(self) -> InotifyWatcher:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def wait(self, timeout: float | None = None) -> set[str] | None:
+        """
+        Block until something changes (or `timeout` seconds pass), then return
+        the paths that may have changed. Returns None if events were lost and
+        the whole tree needs checking.
+        """
+        changed: set[str] = set()
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return changed
+        complete = True
+        while True:
+            complete &= self._read_events(os.read(self._fd, 64 * 1024), changed)
+            if not select.select([self._fd], [], [], DEBOUNCE_SECONDS)[0]:
+                break
+        return changed if complete else None
+
+    def _read_events(self, data: bytes, changed: set[str]) -> bool:
+        complete = True
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                complete = False
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            if wd not in self._dirs or not name:
+                continue
+            directory, names = self._dirs[wd]
+            if names is not None:
+                if name in names:
+                    changed.add(names[name])
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if is_excluded_dir(name):
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        changed.update(self._watch_tree(path))
+                    except OSError:
+                        complete = False
+                else:
+                    # A directory moved away; we don't know which files it held
+                    complete = False
+            elif name.endswith(".py"):
+                changed.add(path)
+        return complete
+
+
+def make_watcher(paths: list[str], interval: float, poll: bool = False):
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(interval)
+
+
+def report(changed: list[tuple[str, list[Finding]]], out: TextIO) -> None:
+    for path, findings in changed:
+        if not findings:
+            print(f"{path}: no problems", file=out)
+        for finding in findings:
+            print(finding.format(), file=out)
+    out.flush()
+
+
+def watch(
+    paths: list[str],
+    interval: float = 0.5,
+    poll: bool = False,
+    jobs: int | None = None,
+    out: TextIO = sys.stdout,
+) -> None:
+    with contextlib.ExitStack() as stack:
+        executor = None if jobs == 1 else stack.enter_context(parallel_executor(jobs))
+        session = WatchSession(paths, executor)
+        # Start watching before the first scan so no edits are missed
+        watcher = make_watcher(paths, interval, poll)
+        stack.callback(watcher.close)
+        stats = ScanStats()
+        report(session.update(stats=stats), out)
+        print(stats.summary(), file=sys.stderr)
+        _watch_loop(session, watcher, out)
+
+
+def _watch_loop(session: WatchSession, watcher, out: TextIO) -> None:
+    while True:
+        candidates = watcher.wait()
+        start = time.perf_counter()
+        changed = session.update(candidates)
+        if changed:
+            report(changed, out)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"-- rescanned in {elapsed:.1f}ms", file=sys.stderr)
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="flake8-qiskit-migration --watch",
+        description="Report deprecated Qiskit imports, then rescan files as they change.",
+    )
+    parser.add_argument("paths", nargs="*", default=["."])
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.5,
+        help="seconds between checks when polling for changes (default: 0.5)",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="poll for changes even if inotify is available",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=jobs_argument,
+        default=None,
+        help='number of workers for full scans, or "auto" for one per CPU '
+        "(default); threads on free-threaded Python, processes otherwise",
+    )
+    args = parser.parse_args(argv)
+    try:
+        watch(args.paths, args.interval, args.poll, args.jobs)
+    except KeyboardInterrupt:
+        pass
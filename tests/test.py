@@ -1,7 +1,20 @@
+import argparse
 import ast
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+import csv
+import io
+import os
+import subprocess
+import sys
 from textwrap import dedent
 
-from flake8_qiskit_migration.plugin import Plugin
+import pytest
+
+from flake8_qiskit_migration import ScanStats, scan_files, scan_sources
+from flake8_qiskit_migration.history import history
+from flake8_qiskit_migration.plugin import RULE_SETS, Plugin
+from flake8_qiskit_migration.scan import gil_enabled, jobs_argument, main as scan_main, parallel_executor
+from flake8_qiskit_migration.watch import InotifyWatcher, WatchSession
 
 
 def _results(code: str):
@@ -337,3 +350,318 @@ def test_dual_message_pulse_specific():
     qkt200 = {r for r in results if "QKT200" in r}
     assert len(qkt100) == 1
     assert len(qkt200) == 1
+
+
+# ---- QKT300 tests (dynamic imports) ----
+
+def test_dynamic_imports():
+    code = """
+    import importlib
+    import importlib as il
+    from importlib import import_module as load
+    importlib.import_module("qiskit.opflow")
+    il.import_module(".aer", package="qiskit.providers")
+    load("qiskit.qobj")
+    __import__("qiskit", fromlist=["BasicAer", "QuantumCircuit"])
+    importlib.import_module("qiskit.circuit")
+    importlib.import_module(name)
+    """
+    assert _results(code) == {
+        "5:0 QKT300: qiskit.opflow has been removed; see https://docs.quantum.ibm.com/api/migration-guides/qiskit-opflow-module",
+        "6:0 QKT300: qiskit.providers.aer has been removed; install separate `qiskit-aer` package and replace `qiskit.aer` with `qiskit_aer`",
+        "7:0 QKT300: qiskit.qobj has been removed in Qiskit 2.0; use QPY (`qiskit.qpy`) or OpenQASM instead",
+        "8:0 QKT300: qiskit.BasicAer has been removed; either install separate `qiskit-aer` package and replace import with `qiskit_aer.Aer`, or follow https://docs.quantum.ibm.com/api/migration-guides/qiskit-1.0-features#providers.basicaer",
+    }
+
+
+def test_qiskit_path_strings():
+    code = """
+    BACKENDS = {"aer": "qiskit.providers.aer.AerSimulator", "basic": "qiskit.providers.basic_provider"}
+    PLUGINS = ["qiskit.opflow", "my_plugin"]
+    print("qiskit.opflow is gone")
+    """
+    assert _results(code) == {
+        "2:19 QKT300: qiskit.providers.aer.AerSimulator has been removed; install separate `qiskit-aer` package and replace `qiskit.aer` with `qiskit_aer`",
+        "3:11 QKT300: qiskit.opflow has been removed; see https://docs.quantum.ibm.com/api/migration-guides/qiskit-opflow-module",
+    }
+
+
+def test_qiskit_path_strings_outside_config_are_ignored():
+    code = """
+    import logging
+    import warnings
+    logger = logging.getLogger("qiskit.providers.aer")
+    warnings.filterwarnings("ignore", module="qiskit.opflow")
+    MESSAGES = {"qiskit.opflow": "has been removed"}
+    name = "qiskit.opflow"
+    """
+    assert _results(code) == set()
+
+
+def test_dynamic_import_reported_once_per_location():
+    # This path is in both the Qiskit 1.0 and 2.0 rule sets
+    code = """
+    import importlib
+    importlib.import_module("qiskit.pulse.library.parametric_pulses.Gaussian")
+    """
+    results = _results(code)
+    assert len(results) == 1
+    assert all(r.startswith("3:0 QKT300") for r in results)
+
+
+def test_select_dynamic_imports_only():
+    code = b"import qiskit.opflow\nimportlib.import_module('qiskit.opflow')\n"
+    assert [f.code for f in scan_sources([("a.py", code)], rules=["QKT300"])] == ["QKT300"]
+    assert [f.code for f in scan_sources([("a.py", code)], rules=["QKT1"])] == ["QKT100"]
+
+
+# ---- Watch mode ----
+
+def test_watch_session_rescans_changed_files(tmp_path):
+    (tmp_path / "a.py").write_text("import qiskit.opflow\n")
+    (tmp_path / "b.py").write_text("import numpy\n")
+    session = WatchSession([str(tmp_path)])
+    changed = session.update()
+    assert [os.path.basename(path) for path, _ in changed] == ["a.py"]
+
+    # Nothing changed on disk, so nothing is rescanned
+    assert session.update() == []
+
+    (tmp_path / "a.py").write_text("import numpy  # fixed\n")
+    (tmp_path / "b.py").write_text("from qiskit import BasicAer\n")
+    changed = dict(session.update())
+    assert changed[str(tmp_path / "a.py")] == []
+    assert [f.code for f in changed[str(tmp_path / "b.py")]] == ["QKT100"]
+
+    (tmp_path / "b.py").unlink()
+    assert session.update([str(tmp_path / "b.py")]) == [(str(tmp_path / "b.py"), [])]
+
+
+def test_watch_session_honours_noqa(tmp_path):
+    (tmp_path / "a.py").write_text(
+        "import qiskit.opflow  # noqa: QKT100\n"
+        "import qiskit.opflow  # noqa: QKT2\n"
+        "import qiskit.qobj  # NOQA\n"
+    )
+    (tmp_path / "b.py").write_text("# flake8: noqa\nimport qiskit.opflow\n")
+    [(path, findings)] = WatchSession([str(tmp_path)]).update()
+    assert path == str(tmp_path / "a.py")
+    assert [(f.line, f.code) for f in findings] == [(2, "QKT100")]
+
+
+def test_watch_jobs_argument():
+    assert jobs_argument("auto") is None
+    assert jobs_argument("3") == 3
+    for value in ["0", "-1", "x"]:
+        with pytest.raises(argparse.ArgumentTypeError):
+            jobs_argument(value)
+
+
+def test_inotify_watcher_reports_changed_paths(tmp_path):
+    if not sys.platform.startswith("linux"):
+        pytest.skip("inotify is Linux-only")
+    with InotifyWatcher([str(tmp_path)]) as watcher:
+        (tmp_path / "a.py").write_text("import qiskit.opflow\n")
+        (tmp_path / "notes.txt").write_text("ignored\n")
+        assert watcher.wait(timeout=5) == {str(tmp_path / "a.py")}
+
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "b.py").write_text("import qiskit.pulse\n")
+        changed = set()
+        for _ in range(5):
+            changed |= watcher.wait(timeout=1) or set()
+            if str(tmp_path / "sub" / "b.py") in changed:
+                break
+        assert str(tmp_path / "sub" / "b.py") in changed
+
+
+def test_watch_session_rescans_reported_paths_with_same_stat(tmp_path):
+    path = tmp_path / "a.py"
+    path.write_text("import qiskit.opflow\n")
+    session = WatchSession([str(tmp_path)])
+    session.update()
+    st = os.stat(path)
+    path.write_text("import qiskit.qobj.x\n")  # same size
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    # A full walk trusts the unchanged (mtime, size)...
+    assert session.update() == []
+    # ...but paths reported by a watcher are always rescanned
+    [(_, findings)] = session.update([str(path)])
+    assert [f.code for f in findings] == ["QKT200"]
+
+
+
+# ---- Streaming API ----
+
+def test_scan_sources():
+    sources = [
+        ("a.py", b"import qiskit.opflow\n"),
+        ("b.py", "import numpy\n"),
+        ("c.py", b"# -*- coding: latin-1 -*-\ns = '\xe9'\nfrom qiskit import BasicAer\n"),
+        ("broken.py", b"import (\n"),
+        ("d.py", b"import qiskit.pulse\n"),
+    ]
+    findings = list(scan_sources(iter(sources)))
+    assert [(f.name, f.line, f.col, f.code) for f in findings] == [
+        ("a.py", 1, 0, "QKT100"),
+        ("c.py", 3, 0, "QKT100"),
+        ("d.py", 1, 0, "QKT200"),
+    ]
+    assert [f.name for f in scan_sources(sources, rules=["QKT200"])] == ["d.py"]
+    with ThreadPoolExecutor(2) as executor:
+        assert list(scan_sources(sources, executor=executor, batch_size=2, max_pending=1)) == findings
+
+
+def test_scan_sources_single_rule_code():
+    code = b"import qiskit.opflow\nimport qiskit.pulse\n"
+    assert [f.code for f in scan_sources([("a.py", code)], rules="QKT200")] == ["QKT200"]
+
+
+class _ManualExecutor(Executor):
+    """Only ever runs the first batch it's given"""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        if not self.futures:
+            future.set_result(fn(*args))
+        self.futures.append(future)
+        return future
+
+
+def test_scan_sources_cancels_pending_batches():
+    executor = _ManualExecutor()
+    sources = [(f"{i}.py", b"import qiskit.opflow\n") for i in range(10)]
+    findings = scan_sources(sources, executor=executor, batch_size=1, max_pending=4)
+    assert next(findings).name == "0.py"
+    findings.close()
+    assert len(executor.futures) == 4
+    assert all(future.cancelled() for future in executor.futures[1:])
+
+
+# ---- Parallel scanning ----
+
+def test_rule_tables_are_read_only():
+    for _, paths, exceptions in RULE_SETS:
+        with pytest.raises(TypeError):
+            paths["qiskit.new"] = "{} is deprecated"
+        assert isinstance(exceptions, frozenset)
+
+
+def test_parallel_executor_matches_gil():
+    with parallel_executor(2) as executor:
+        expected = ProcessPoolExecutor if gil_enabled() else ThreadPoolExecutor
+        assert isinstance(executor, expected)
+
+
+def test_threaded_watch_session_scan(tmp_path):
+    for i in range(40):
+        (tmp_path / f"m{i}.py").write_text("import numpy\n" * i + "import qiskit.opflow\n")
+    serial = WatchSession([str(tmp_path)]).update()
+    with ThreadPoolExecutor(4) as executor:
+        threaded = WatchSession([str(tmp_path)], executor).update()
+    assert threaded == serial
+    assert len(serial) == 40
+
+
+def test_parallel_command_line_scan(tmp_path, capsys):
+    (tmp_path / "a.py").write_text("import qiskit.opflow\nimport qiskit.qobj  # noqa: QKT200\n")
+    (tmp_path / "b.py").write_text("import numpy\n")
+    with pytest.raises(SystemExit) as exit_info:
+        scan_main(["--jobs", "2", str(tmp_path)])
+    assert exit_info.value.code == 1
+    assert capsys.readouterr().out.splitlines() == [
+        f"{tmp_path / 'a.py'}:1:1: QKT100: qiskit.opflow has been removed; see https://docs.quantum.ibm.com/api/migration-guides/qiskit-opflow-module",
+    ]
+
+    (tmp_path / "vendored.py").write_bytes((tmp_path / "a.py").read_bytes())
+    with pytest.raises(SystemExit):
+        scan_main(["--jobs", "2", str(tmp_path)])
+    output = capsys.readouterr()
+    assert len(output.out.splitlines()) == 2
+    assert "skipped 1 duplicates" in output.err
+
+    scan_main(["-j", "1", str(tmp_path / "b.py")])
+    assert capsys.readouterr().out == ""
+
+
+# ---- History mode ----
+
+def _git(repo, *args):
+    subprocess.run(
+        ["git", "-C", str(repo), "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        check=True,
+        capture_output=True,
+    )
+
+
+def test_history_counts_per_commit(tmp_path):
+    _git(tmp_path, "init")
+    (tmp_path / "lib").mkdir()
+    (tmp_path / "a.py").write_text("import qiskit.opflow\n")
+    (tmp_path / "lib" / "b.py").write_text("from qiskit import BasicAer, Aer\n")
+    (tmp_path / "lib" / "copy.py").write_text("import qiskit.opflow\n")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-m", "first")
+    (tmp_path / "c.py").write_text("import qiskit.pulse\n")
+    (tmp_path / "a.py").write_text("import numpy\n")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-m", "second")
+
+    out = io.StringIO()
+    scanner = history(["HEAD"], repo=str(tmp_path), out=out)
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert rows[0] == ["commit", "date", "QKT100", "QKT200", "QKT300"]
+    assert [row[2:] for row in rows[1:]] == [["4", "0", "0"], ["3", "1", "0"]]
+    # `a.py` and `lib/copy.py` share a blob in the first commit, and `lib/`
+    # is unchanged in the second
+    assert scanner.blobs_scanned == 4
+    assert scanner.files_seen == 7
+
+    out = io.StringIO()
+    history(["HEAD"], repo=str(tmp_path), rules="QKT200", out=out)
+    assert out.getvalue().splitlines()[0] == "commit,date,QKT200"
+
+
+# ---- Duplicate files ----
+
+def test_scan_files_deduplicates_contents(tmp_path):
+    for name in ["a.py", "b.py", "c.py"]:
+        (tmp_path / name).write_text("import qiskit.opflow\nimport qiskit.pulse\n")
+    (tmp_path / "d.py").write_text("import numpy\n")
+    paths = [str(tmp_path / name) for name in ["a.py", "b.py", "c.py", "d.py", "missing.py"]]
+
+    stats = ScanStats()
+    findings = list(scan_files(paths, stats=stats))
+    assert [(os.path.basename(f.name), f.code) for f in findings] == [
+        ("a.py", "QKT100"), ("a.py", "QKT200"),
+        ("b.py", "QKT100"), ("b.py", "QKT200"),
+        ("c.py", "QKT100"), ("c.py", "QKT200"),
+    ]
+    assert (stats.files, stats.unique_files, stats.duplicate_files) == (4, 2, 2)
+    with ThreadPoolExecutor(2) as executor:
+        assert list(scan_files(paths, executor=executor)) == findings
+
+
+def test_scan_files_streams_in_order_on_executor(tmp_path):
+    contents = ["import qiskit.opflow\n", "import numpy\n", "import qiskit.pulse\n"]
+    paths = []
+    for i in range(12):
+        path = tmp_path / f"{i:02}.py"
+        path.write_text(contents[i * 7 % 3])
+        paths.append(str(path))
+
+    serial_stats = ScanStats()
+    serial = list(scan_files(paths, stats=serial_stats))
+    with ThreadPoolExecutor(3) as executor:
+        stats = ScanStats()
+        findings = scan_files(paths, executor=executor, batch_size=1, max_pending=2, stats=stats)
+        # Results arrive before the whole tree has been hashed
+        assert next(findings) == serial[0]
+        assert stats.files < len(paths)
+        assert [next(findings)] + list(findings) == serial[1:]
+    assert stats == serial_stats
+    assert (stats.files, stats.unique_files) == (12, 3)